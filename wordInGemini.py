@@ -1,30 +1,71 @@
 import re
 import os
-import json
+import random
 import sqlite3
 import time
+import asyncio
+import threading
 from typing import List, Callable, Optional
 
+import orjson
+
 from google.genai import types # Assuming this is google.generativeai.types
 from google import genai     # Your specific client library
+from google.genai import errors
 
 # --- Configuration ---
 MAX_RETRIES = 5
-RETRY_DELAY_SECONDS = 5
-SQL_OUTPUT_FILE = 'translations_inserts.sql'
+MAX_RETRIES_RATE_LIMITED = 10 # Attempts allowed once the API answers 429/503 (quota or overload)
+RETRY_BASE_DELAY_SECONDS = 1 # First retry waits this long; doubles per attempt
+RETRY_MAX_DELAY_SECONDS = 60
+RETRY_JITTER_SECONDS = 1 # Up to this much random delay is added on top of each backoff step
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504} # Other API errors (400, 403, 404...) fail immediately
+RATE_LIMITED_STATUS_CODES = {429, 503}
+WORDS_PER_PROMPT = 1 # >1 sends several words per request; only for endpoints tuned to answer a JSON array
+MAX_OUTPUT_TOKENS_PER_WORD = 4096 # Output budget grows with the batch, up to MAX_OUTPUT_TOKENS
+MAX_OUTPUT_TOKENS = 8192 # Model's output ceiling; requests above it are rejected with a 400
+MAX_CONCURRENT_REQUESTS = 16 # Words whose model calls are in flight at the same time
+REQUESTS_PER_SECOND = 2.0 # Shared API rate limit across all requests (bursts up to MAX_CONCURRENT_REQUESTS)
 ERROR_LOG_FILE = 'processing_errors.log'
-DB_NAME = 'MudadibFullGemini.db' # Database for checking existing words and for schema
+DB_NAME = 'MudadibFullGemini.db' # Database that parsed words, translations and examples are written to
 TEXT_FILE_PATH = r"C:\Dev\Application\book-prepare\third_book_all_chapters.txt" # YOUR TEXT FILE PATH
 SUCCESSFUL_JSON_LOG_FILE = 'successful_model_responses.jsonl' # For logging raw successful JSONs
+LOG_BUFFER_SIZE = 1 << 16 # Write buffer for the log files, which stay open for the whole run
+LOG_FLUSH_INTERVAL = 50 # Flush the log files after this many finished words
+
+# Precompiled patterns used on every word/example
+_WORD_RE = re.compile(r'\b[a-zäöüßA-ZÄÖÜ]+\b')
+_EM_RE = re.compile(r'\|([^|]+)\|')
+
+def json_dumps_str(obj) -> str:
+    """
+    Serializes with orjson and returns a str: compact separators, non-ASCII written as raw UTF-8.
+    Note base_form_json/info_json rows written before the switch to orjson use json.dumps defaults
+    instead (', '/': ' separators, non-ASCII escaped as \\uXXXX), so compare them as parsed JSON, not text.
+    """
+    return orjson.dumps(obj).decode('utf-8')
+
+def fast_json_str(value) -> str:
+    """json_dumps_str with shortcuts for None and for plain strings that need no escaping (e.g. a lemma)."""
+    if value is None:
+        return 'null'
+    # isprintable() rules out control characters, leaving only quotes and backslashes to check
+    if isinstance(value, str) and value.isprintable() and '"' not in value and '\\' not in value:
+        return '"' + value + '"'
+    return json_dumps_str(value)
 
 # --- Word Extraction and Filtering ---
 def read_and_extract_words_from_text_file(file_path: str) -> List[str]:
     """Read file and extract unique German words."""
     try:
+        # Scan line by line so the whole book is never held in memory as one string
+        surface_forms = set()
         with open(file_path, 'r', encoding='utf-8') as file:
-            text = file.read()
-        words = re.findall(r'\b[a-zäöüßA-ZÄÖÜ]+\b', text.lower())
-        unique_words = sorted(set(words))
+            for line in file:
+                surface_forms.update(_WORD_RE.findall(line))
+        # Lowercase each distinct surface form once instead of the whole text. Sorted so that
+        # words are processed in the same order on every run (set order varies with hashing).
+        unique_words = sorted({word.lower() for word in surface_forms})
         print(f"Found {len(unique_words)} unique words in the text file.")
         return unique_words
     except FileNotFoundError:
@@ -44,14 +85,13 @@ def get_new_words_not_in_db(words_from_text: List[str], db_path: str) -> List[st
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         try:
-            existing_queried_words = set() # Check against queried_word for simplicity
-            cursor.execute("SELECT DISTINCT queried_word FROM words")
-            for row in cursor.fetchall():
-                existing_queried_words.add(row[0].lower())
-            
-            for word in words_from_text:
-                if word.lower() not in existing_queried_words:
-                    new_words_to_query.append(word)
+            # Let SQLite compute the difference against the queried_word index instead of
+            # pulling rows into Python. Queried words are always stored lowercased.
+            cursor.execute("CREATE TEMP TABLE IF NOT EXISTS _tmp_words (w TEXT PRIMARY KEY)")
+            cursor.executemany("INSERT OR IGNORE INTO _tmp_words (w) VALUES (?)", [(word.lower(),) for word in words_from_text])
+            cursor.execute("SELECT w FROM _tmp_words WHERE w NOT IN (SELECT queried_word FROM words)")
+            new_words_to_query = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DROP TABLE _tmp_words")
 
         except sqlite3.OperationalError as e:
             print(f"Database operational error (e.g., table 'words' not found during check): {e}")
@@ -66,8 +106,22 @@ def get_new_words_not_in_db(words_from_text: List[str], db_path: str) -> List[st
     
     return new_words_to_query
 
-# --- SQL Generation Functions ---
-sql_insert_statements = []
+# --- Database Functions ---
+# Statement texts are built once and reused; sqlite3 caches the prepared statement per text
+_INSERT_WORD_SQL = "INSERT OR IGNORE INTO words (queried_word, base_form_json, primary_type, info_json) VALUES (?, ?, ?, ?)"
+_SELECT_WORD_ID_SQL = "SELECT word_id FROM words WHERE queried_word = ?"
+_INSERT_TRANSLATION_SQL = "INSERT INTO word_translations (word_id, meaning, additional_info, meta_type) VALUES (?, ?, ?, ?)"
+_LAST_INSERT_ROWID_SQL = "SELECT last_insert_rowid()"
+_INSERT_EXAMPLE_SQL = "INSERT INTO translation_examples (translation_id, source_text, target_text) VALUES (?, ?, ?)"
+
+def open_db_connection(db_path: str) -> sqlite3.Connection:
+    """Opens the output database, tuned for many small write transactions, and ensures the schema exists."""
+    # Writes run in worker threads (asyncio.to_thread), one at a time, so the connection may cross threads
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.executescript(generate_schema_sql())
+    return conn
 
 def generate_schema_sql():
     """Generates SQL for table creation."""
@@ -108,31 +162,40 @@ def generate_schema_sql():
     ]
     return "\n".join(schema_sqls) + "\n\n"
 
-def escape_sql_string(value):
-    """Escapes single quotes for SQL strings."""
-    if value is None:
-        return "NULL"
-    return "'" + str(value).replace("'", "''") + "'"
+def to_sql_value(value):
+    """Makes a model value bindable: scalars pass through, dicts/lists become JSON text, anything else str()."""
+    if value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool)):
+        return value
+    if isinstance(value, (dict, list)):
+        return json_dumps_str(value)
+    return str(value)
 
 def transform_example_text(text: str) -> str:
     """Replaces |word| with <em>word</em> in example texts."""
-    if text is None:
-        return None
-    return re.sub(r'\|([^|]+)\|', r'<em>\1</em>', text)
-
-def extract_and_generate_sql_for_word(assistant_content_json, original_queried_word):
+    if text is None or '|' not in text:
+        return text
+    if text.count('|') % 2 or '||' in text:
+        # Unpaired or empty markers: keep the regex semantics (such bars are left as-is)
+        return _EM_RE.sub(r'<em>\1</em>', text)
+    parts = text.split('|')
+    # Even indexes are outside the markers, odd indexes are the emphasized words
+    for i in range(1, len(parts), 2):
+        parts[i] = f"<em>{parts[i]}</em>"
+    return ''.join(parts)
+
+def extract_and_generate_sql_for_word(conn, assistant_content_json, original_queried_word):
     """
-    Extracts data and generates INSERT SQL statements.
+    Extracts data and inserts it into the database through 'conn'.
     'original_queried_word' is the word that was used in the prompt.
-    Transforms example texts.
+    Transforms example texts. All rows of one word are written in a single transaction.
     """
     try:
         word_info_from_model = assistant_content_json['word_info']
         all_translations_from_model = assistant_content_json.get('translations', [])
 
         db_queried_word = original_queried_word
-        db_base_form_json_str = json.dumps(word_info_from_model.get('base_form'))
-        db_info_json_str = json.dumps(word_info_from_model.get('additional_info'))
+        db_base_form_json_str = fast_json_str(word_info_from_model.get('base_form'))
+        db_info_json_str = fast_json_str(word_info_from_model.get('additional_info'))
         
         db_primary_type = None
         base_form_content = word_info_from_model.get('base_form')
@@ -145,72 +208,112 @@ def extract_and_generate_sql_for_word(assistant_content_json, original_queried_w
                 if 'type' in additional_info_content: db_primary_type = additional_info_content['type']
                 elif 'usage' in additional_info_content and not db_primary_type: db_primary_type = additional_info_content['usage']
         if not db_primary_type: db_primary_type = "unknown"
+        db_primary_type = to_sql_value(db_primary_type)
 
-        sql_insert_statements.append(
-            f"INSERT OR IGNORE INTO words (queried_word, base_form_json, primary_type, info_json) VALUES "
-            f"({escape_sql_string(db_queried_word)}, {escape_sql_string(db_base_form_json_str)}, {escape_sql_string(db_primary_type)}, {escape_sql_string(db_info_json_str)});"
-        )
-        
-        word_id_subquery = f"(SELECT word_id FROM words WHERE queried_word = {escape_sql_string(db_queried_word)})"
-        
-        for trans_data in all_translations_from_model:
-            meaning = trans_data.get('meaning')
-            additional_info_trans = trans_data.get('additionalInfo')
-            meta_type_trans = trans_data.get('type')
-
-            if meaning is None:
-                log_error(original_queried_word, f"Skipping a translation due to missing meaning key or null value.", trans_data)
-                continue
-
-            sql_insert_statements.append(
-                f"INSERT INTO word_translations (word_id, meaning, additional_info, meta_type) VALUES "
-                f"({word_id_subquery}, {escape_sql_string(meaning)}, {escape_sql_string(additional_info_trans)}, {escape_sql_string(meta_type_trans)});"
-            )
-            
-            translation_id_subquery = (
-                f"(SELECT translation_id FROM word_translations WHERE word_id = {word_id_subquery} "
-                f"AND meaning = {escape_sql_string(meaning)} "
-                f"AND COALESCE(additional_info, 'NULL_MARKER') = COALESCE({escape_sql_string(additional_info_trans)}, 'NULL_MARKER') "
-                f"AND COALESCE(meta_type, 'NULL_MARKER') = COALESCE({escape_sql_string(meta_type_trans)}, 'NULL_MARKER') "
-                f"ORDER BY translation_id DESC LIMIT 1)"
+        with conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                _INSERT_WORD_SQL,
+                (db_queried_word, db_base_form_json_str, db_primary_type, db_info_json_str)
             )
-
-            for ex_data in trans_data.get('examples', []):
-                source_text_raw = ex_data.get('source')
-                target_text_raw = ex_data.get('target')
-
-                if source_text_raw and target_text_raw:
-                    source_text_transformed = transform_example_text(source_text_raw)
-                    target_text_transformed = transform_example_text(target_text_raw)
-
-                    sql_insert_statements.append(
-                        f"INSERT INTO translation_examples (translation_id, source_text, target_text) VALUES "
-                        f"({translation_id_subquery}, {escape_sql_string(source_text_transformed)}, {escape_sql_string(target_text_transformed)});"
-                    )
+            if cursor.rowcount == 1:
+                word_id = cursor.lastrowid
+            else: # Word already present; attach the translations to the existing row
+                word_id = cursor.execute(_SELECT_WORD_ID_SQL, (db_queried_word,)).fetchone()[0]
+
+            translation_rows = []
+            examples_per_translation = []
+            for trans_data in all_translations_from_model:
+                meaning = trans_data.get('meaning')
+                additional_info_trans = trans_data.get('additionalInfo')
+                meta_type_trans = trans_data.get('type')
+
+                if meaning is None:
+                    log_error(original_queried_word, f"Skipping a translation due to missing meaning key or null value.", trans_data)
+                    continue
+
+                translation_rows.append((word_id, to_sql_value(meaning), to_sql_value(additional_info_trans), to_sql_value(meta_type_trans)))
+
+                translation_examples = []
+                for ex_data in trans_data.get('examples', []):
+                    source_text_raw = ex_data.get('source')
+                    target_text_raw = ex_data.get('target')
+
+                    if source_text_raw and target_text_raw:
+                        source_text_transformed = transform_example_text(source_text_raw)
+                        target_text_transformed = transform_example_text(target_text_raw)
+                        translation_examples.append((source_text_transformed, target_text_transformed))
+                examples_per_translation.append(translation_examples)
+
+            if translation_rows:
+                cursor.executemany(
+                    _INSERT_TRANSLATION_SQL,
+                    translation_rows
+                )
+                # Rowids assigned back-to-back inside one write transaction are contiguous, so the
+                # translation IDs follow from last_insert_rowid() without looking rows up again.
+                # (cursor.lastrowid is not updated by executemany.)
+                last_translation_id = cursor.execute(_LAST_INSERT_ROWID_SQL).fetchone()[0]
+                first_translation_id = last_translation_id - len(translation_rows) + 1
+
+                cursor.executemany(
+                    _INSERT_EXAMPLE_SQL,
+                    [
+                        (first_translation_id + offset, source_text, target_text)
+                        for offset, translation_examples in enumerate(examples_per_translation)
+                        for source_text, target_text in translation_examples
+                    ]
+                )
         
-        # print(f"SQL generated for queried word '{db_queried_word}'.") # Now handled by process_word_with_retries
+        # print(f"Saved queried word '{db_queried_word}' to the database.") # Now handled by process_word_with_retries
         return True
 
     except KeyError as e:
         log_error(original_queried_word, f"Parsing error: Missing key {e}.", assistant_content_json)
         return False
     except Exception as e:
-        log_error(original_queried_word, f"Unexpected error during SQL generation: {e}", assistant_content_json)
+        log_error(original_queried_word, f"Unexpected error while saving to the database: {e}", assistant_content_json)
         return False
 
 # --- Model Interaction and Parsing ---
+class RateLimiter:
+    """Token bucket shared by all concurrent requests: 'rate' calls per second on average, bursts up to 'burst'."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+
+    async def acquire(self):
+        """Waits until the caller may make one request."""
+        # No lock needed: this section does not await, so it runs atomically on the event loop
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        self._tokens -= 1 # Reserve a token; a negative balance is the caller's wait time
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    def pause(self, seconds: float):
+        """Holds back all callers for at least 'seconds' (e.g. after a 429); pauses do not stack."""
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+api_rate_limiter = RateLimiter(REQUESTS_PER_SECOND, MAX_CONCURRENT_REQUESTS)
+api_request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS) # Caps model calls in flight, batch or single
+
 def parse_model_output_for_assistant_content(raw_streamed_output):
     try:
         # print("Attempting to parse the received output directly as the assistant's content JSON...")
-        inner_json_data = json.loads(raw_streamed_output)
+        inner_json_data = orjson.loads(raw_streamed_output)
         # print("Successfully parsed the output as assistant's content JSON.")
         if 'word_info' not in inner_json_data:
             # print("Validation Error: Parsed JSON missing required 'word_info' key.")
             raise ValueError("Parsed JSON missing required 'word_info' key.")
         return inner_json_data
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"Failed to parse direct output as JSON: {e}")
-        print(f"Problematic string was:\n{raw_streamed_output}") 
+        print(f"Problematic string was:\n{bytes(raw_streamed_output).decode('utf-8', errors='replace')}") 
         return None
     except ValueError:
         return None
@@ -218,8 +321,36 @@ def parse_model_output_for_assistant_content(raw_streamed_output):
         print(f"Unexpected error during direct parsing: {e}")
         return None
 
-def get_translation_from_model(client, model_path_str, original_word_to_query):
-    text_prompt = f"de-en? {original_word_to_query}" # Your specific prompt format
+def parse_batch_model_output(raw_streamed_output, requested_words: List[str]) -> dict:
+    """
+    Parses a batch answer: a JSON array of {queried_word, word_info, translations} objects.
+    Returns {queried_word: assistant content} for the requested words that came back valid.
+    """
+    try:
+        batch_items = orjson.loads(raw_streamed_output)
+    except orjson.JSONDecodeError as e:
+        print(f"Failed to parse batch output as JSON: {e}")
+        return {}
+    if not isinstance(batch_items, list):
+        print("Batch output is not a JSON array.")
+        return {}
+    requested = set(requested_words)
+    responses = {}
+    for item in batch_items:
+        if not isinstance(item, dict) or 'word_info' not in item:
+            continue
+        queried_word = str(item.get('queried_word', '')).lower()
+        if queried_word in requested:
+            responses[queried_word] = {'word_info': item['word_info'], 'translations': item.get('translations', [])}
+    return responses
+
+def build_prompt(words_to_query: List[str]) -> str:
+    if len(words_to_query) == 1:
+        return f"de-en? {words_to_query[0]}" # Your specific prompt format
+    return "de-en batch?\n" + "\n".join(words_to_query) # Answered with a JSON array, one object per word
+
+async def get_translation_from_model(client, model_path_str, words_to_query: List[str]):
+    text_prompt = build_prompt(words_to_query)
     contents = [types.Content(role="user", parts=[types.Part.from_text(text=text_prompt)])]
     # Add system message if your setup requires it for the desired JSON output:
     # contents.insert(0, types.Content(role="system", parts=[types.Part.from_text(text="word info")]))
@@ -233,164 +364,291 @@ def get_translation_from_model(client, model_path_str, original_word_to_query):
     generate_content_config_obj = types.GenerateContentConfig(
         temperature=0.1, 
         top_p=0.95, 
-        max_output_tokens=4096, 
+        max_output_tokens=min(MAX_OUTPUT_TOKENS_PER_WORD * len(words_to_query), MAX_OUTPUT_TOKENS), 
         safety_settings=safety_settings_list
     )
 
-    raw_model_output_chunks = []
-    for chunk in client.models.generate_content_stream(
-        model=model_path_str, 
-        contents=contents, 
-        config=generate_content_config_obj
-    ):
-        if hasattr(chunk, 'text'):
-            raw_model_output_chunks.append(chunk.text)
-    return "".join(raw_model_output_chunks)
-
-def process_word_with_retries(client, model_path_str, original_word_to_query):
+    async with api_request_slots:
+        await api_rate_limiter.acquire()
+        # Accumulate UTF-8 bytes in place; orjson parses bytes directly, so no joined str copy is made
+        raw_model_output = bytearray()
+        async for chunk in await client.aio.models.generate_content_stream(
+            model=model_path_str, 
+            contents=contents, 
+            config=generate_content_config_obj
+        ):
+            if getattr(chunk, 'text', None):
+                raw_model_output += chunk.text.encode('utf-8')
+    return raw_model_output
+
+def get_retry_after_seconds(error) -> Optional[float]:
+    """Returns the Retry-After header of an API error response in seconds, if it has one."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+def get_retry_delay(attempt: int, error=None) -> float:
+    """Exponential backoff plus jitter for the given (1-based) attempt; a Retry-After from the API wins."""
+    retry_after = get_retry_after_seconds(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, RETRY_MAX_DELAY_SECONDS)
+    delay = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1))
+    return delay + random.uniform(0, RETRY_JITTER_SECONDS)
+
+async def query_model_with_retries(client, model_path_str, words_to_query: List[str], parse_output):
+    """
+    Sends one request for 'words_to_query' and returns parse_output(raw output), or None after
+    MAX_RETRIES attempts (MAX_RETRIES_RATE_LIMITED once the API reports a quota/overload error).
+    Empty output and a None/empty parse result are retried like transient API errors.
+    """
+    words_label = ", ".join(words_to_query)
     full_raw_streamed_output_for_logging = "" 
-    for attempt in range(1, MAX_RETRIES + 1):
-        print(f"Processing '{original_word_to_query}', Attempt {attempt}/{MAX_RETRIES}...")
+    attempt = 0
+    max_attempts = MAX_RETRIES
+    while attempt < max_attempts:
+        attempt += 1
+        print(f"Processing '{words_label}', Attempt {attempt}/{max_attempts}...")
         try:
-            full_raw_streamed_output = get_translation_from_model(client, model_path_str, original_word_to_query)
+            full_raw_streamed_output = await get_translation_from_model(client, model_path_str, words_to_query)
             full_raw_streamed_output_for_logging = full_raw_streamed_output 
 
             if not full_raw_streamed_output or not full_raw_streamed_output.strip():
-                print(f"No content received from model for '{original_word_to_query}' on attempt {attempt}.")
-                if attempt < MAX_RETRIES: 
-                    print(f"Retrying in {RETRY_DELAY_SECONDS} seconds...")
-                    time.sleep(RETRY_DELAY_SECONDS); continue
+                print(f"No content received from model for '{words_label}' on attempt {attempt}.")
+                if attempt < max_attempts: 
+                    retry_delay = get_retry_delay(attempt)
+                    print(f"Retrying in {retry_delay:.1f} seconds...")
+                    await asyncio.sleep(retry_delay); continue
                 else: 
-                    log_error(original_word_to_query, "No content from model after max retries.", full_raw_streamed_output_for_logging)
-                    return False
+                    log_error(words_label, "No content from model after max retries.", full_raw_streamed_output_for_logging)
+                    return None
 
-            assistant_content_json = parse_model_output_for_assistant_content(full_raw_streamed_output)
+            assistant_content_json = parse_output(full_raw_streamed_output)
 
             if assistant_content_json:
-                print(f"Successfully parsed model output for '{original_word_to_query}' on attempt {attempt}.")
-                if extract_and_generate_sql_for_word(assistant_content_json, original_word_to_query):
-                    try:
-                        with open(SUCCESSFUL_JSON_LOG_FILE, 'a', encoding='utf-8') as f_json_log:
-                            log_entry = {
-                                "queried_word": original_word_to_query,
-                                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                                "response_data": assistant_content_json
-                            }
-                            f_json_log.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-                    except Exception as log_e:
-                        print(f"Warning: Could not write to successful JSON log: {log_e}")
-                    return True 
-                else:
-                    print(f"Failed to generate SQL for '{original_word_to_query}' (logged).")
-                    # Error already logged by extract_and_generate_sql_for_word
-                    return False 
+                print(f"Successfully parsed model output for '{words_label}' on attempt {attempt}.")
+                return assistant_content_json
             else:
-                print(f"Failed to parse model output for '{original_word_to_query}' on attempt {attempt} (parser returned None).")
-                if attempt < MAX_RETRIES:
-                    print(f"Retrying API call and parsing in {RETRY_DELAY_SECONDS} seconds...")
-                    time.sleep(RETRY_DELAY_SECONDS)
+                print(f"Failed to parse model output for '{words_label}' on attempt {attempt} (parser returned None).")
+                if attempt < max_attempts:
+                    retry_delay = get_retry_delay(attempt)
+                    print(f"Retrying API call and parsing in {retry_delay:.1f} seconds...")
+                    await asyncio.sleep(retry_delay)
                 else:
-                    log_error(original_word_to_query, "Failed to parse model output after max retries (parser returned None).", full_raw_streamed_output_for_logging)
-                    return False
+                    log_error(words_label, "Failed to parse model output after max retries (parser returned None).", full_raw_streamed_output_for_logging)
+                    return None
+        except errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES:
+                print(f"Non-retryable API error for '{words_label}' on attempt {attempt}: {e}")
+                log_error(words_label, f"Non-retryable API error ({e.code}): {e}", full_raw_streamed_output_for_logging if full_raw_streamed_output_for_logging else "No raw output captured due to early exception.")
+                return None
+            print(f"Transient API error for '{words_label}' on attempt {attempt}: {e}")
+            if e.code in RATE_LIMITED_STATUS_CODES:
+                # Quota errors clear up with time, so allow more attempts instead of giving up
+                max_attempts = MAX_RETRIES_RATE_LIMITED
+            if attempt < max_attempts:
+                retry_delay = get_retry_delay(attempt, e)
+                if e.code == 429:
+                    api_rate_limiter.pause(retry_delay) # Slow every request down, not just this one
+                print(f"Retrying in {retry_delay:.1f} seconds...")
+                await asyncio.sleep(retry_delay)
+            else:
+                log_error(words_label, f"API error after max retries ({e.code}): {e}", full_raw_streamed_output_for_logging if full_raw_streamed_output_for_logging else "No raw output captured due to early exception.")
+                return None
         except Exception as e:
-            print(f"Unexpected error processing '{original_word_to_query}' on attempt {attempt}: {e}")
-            if attempt < MAX_RETRIES: 
-                print(f"Retrying in {RETRY_DELAY_SECONDS} seconds...")
-                time.sleep(RETRY_DELAY_SECONDS)
+            print(f"Unexpected error processing '{words_label}' on attempt {attempt}: {e}")
+            if attempt < max_attempts: 
+                retry_delay = get_retry_delay(attempt)
+                print(f"Retrying in {retry_delay:.1f} seconds...")
+                await asyncio.sleep(retry_delay)
             else: 
-                log_error(original_word_to_query, f"Unexpected error after max retries: {e}", full_raw_streamed_output_for_logging if full_raw_streamed_output_for_logging else "No raw output captured due to early exception.")
-                return False
-    return False
+                log_error(words_label, f"Unexpected error after max retries: {e}", full_raw_streamed_output_for_logging if full_raw_streamed_output_for_logging else "No raw output captured due to early exception.")
+                return None
+    return None
+
+async def process_word_with_retries(client, model_path_str, original_word_to_query):
+    """
+    Queries the model for one word and returns the parsed response, or None after the retries.
+    Many of these run concurrently, so it only talks to the API; saving is done by save_word_response.
+    """
+    return await query_model_with_retries(client, model_path_str, [original_word_to_query], parse_model_output_for_assistant_content)
+
+async def fetch_word_batch_responses(client, model_path_str, words_to_query: List[str]) -> dict:
+    """
+    Asks for several words in one request, with the same retries (and 429 pauses) as a single word.
+    Returns {word: response} for the words answered; anything missing, or a batch that still
+    failed after the retries (already logged), is left to the per-word path.
+    """
+    responses = await query_model_with_retries(
+        client, model_path_str, words_to_query,
+        lambda raw_batch_output: parse_batch_model_output(raw_batch_output, words_to_query)
+    )
+    if not responses:
+        print(f"Batch request for {len(words_to_query)} words failed, falling back to single-word requests.")
+        return {}
+    if len(responses) < len(words_to_query):
+        missing_words = [word for word in words_to_query if word not in responses]
+        print(f"Batch answered {len(responses)}/{len(words_to_query)} words; the rest are queried one by one.")
+        log_error(", ".join(missing_words), f"Missing from a batch answer for {len(words_to_query)} words; retried singly.")
+    return responses
+
+def save_word_response(conn, f_json_log, original_word_to_query, assistant_content_json):
+    """Saves a word to the database and logs its model response."""
+    if not extract_and_generate_sql_for_word(conn, assistant_content_json, original_word_to_query):
+        print(f"Failed to save '{original_word_to_query}' to the database (logged).")
+        # Error already logged by extract_and_generate_sql_for_word
+        return False
+    try:
+        log_entry = {
+            "queried_word": original_word_to_query,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "response_data": assistant_content_json
+        }
+        f_json_log.write(orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE))
+    except Exception as log_e:
+        print(f"Warning: Could not write to successful JSON log: {log_e}")
+    return True
+
+error_log_file = None # Opened once in __main__; log_error falls back to appending per call without it
+_log_error_lock = threading.Lock() # log_error is called from the event loop and from DB write threads
 
 def log_error(word_query, reason, raw_output_data=""):
     error_message = f"Word: {word_query}\nReason: {reason}\n"
     if isinstance(raw_output_data, dict) or isinstance(raw_output_data, list): 
-        error_message += f"Parsed Data (or part of it):\n{json.dumps(raw_output_data, indent=2, ensure_ascii=False)}\n"
+        error_message += f"Parsed Data (or part of it):\n{orjson.dumps(raw_output_data, option=orjson.OPT_INDENT_2).decode('utf-8')}\n"
+    elif isinstance(raw_output_data, (bytes, bytearray)) and raw_output_data:
+        error_message += f"Raw Output:\n{raw_output_data.decode('utf-8', errors='replace')}\n"
     elif raw_output_data: 
         error_message += f"Raw Output:\n{raw_output_data}\n"
     error_message += "-" * 30 + "\n"
     
-    with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(error_message)
+    with _log_error_lock:
+        if error_log_file is not None:
+            error_log_file.write(error_message)
+        else:
+            with open(ERROR_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write(error_message)
     print(f"Logged error for '{word_query}' to {ERROR_LOG_FILE}")
 
+async def fetch_and_save_words(conn, f_json_log, client, model_path_str, words_to_fetch):
+    """
+    Queries the model for all words with MAX_CONCURRENT_REQUESTS worker tasks (WORDS_PER_PROMPT
+    words per request) and saves each word as soon as its response arrives.
+    Returns (successful, failed).
+    """
+    # Bounded, so a large book never has more than a few pending word groups in memory
+    word_groups = asyncio.Queue(maxsize=MAX_CONCURRENT_REQUESTS)
+    db_lock = asyncio.Lock() # One DB write thread at a time; the connection is not shared concurrently
+    counts = {'successful': 0, 'failed': 0, 'finished': 0}
+
+    async def save_and_report(word_query, assistant_content_json):
+        saved = False
+        if assistant_content_json is not None:
+            async with db_lock:
+                saved = await asyncio.to_thread(save_word_response, conn, f_json_log, word_query, assistant_content_json)
+        counts['finished'] += 1
+        print(f"\n--- Finished word {counts['finished']}/{len(words_to_fetch)}: '{word_query}' ---")
+        if saved:
+            counts['successful'] +=1
+            print(f"Successfully processed and saved '{word_query}'.")
+        else:
+            counts['failed'] +=1
+            print(f"Failed to process '{word_query}' after retries.")
+
+        if counts['finished'] % LOG_FLUSH_INTERVAL == 0:
+            async with db_lock: # f_json_log is written by the DB write threads
+                f_json_log.flush()
+            with _log_error_lock:
+                if error_log_file is not None: # Not opened when called outside __main__
+                    error_log_file.flush()
+
+    async def fetch_and_save_single(word_query):
+        await save_and_report(word_query, await process_word_with_retries(client, model_path_str, word_query))
+
+    async def worker():
+        while True:
+            word_group = await word_groups.get()
+            if word_group is None:
+                return
+            batch_responses = {}
+            if len(word_group) > 1:
+                batch_responses = await fetch_word_batch_responses(client, model_path_str, word_group)
+            for word_query in word_group:
+                if word_query in batch_responses:
+                    await save_and_report(word_query, batch_responses[word_query])
+            # Words the batch did not answer are queried concurrently; api_request_slots keeps the cap
+            await asyncio.gather(*(fetch_and_save_single(word_query) for word_query in word_group if word_query not in batch_responses))
+
+    async def enqueue_word_groups():
+        for start in range(0, len(words_to_fetch), WORDS_PER_PROMPT):
+            await word_groups.put(words_to_fetch[start:start + WORDS_PER_PROMPT])
+        for _ in range(MAX_CONCURRENT_REQUESTS):
+            await word_groups.put(None) # One stop marker per worker
+
+    await asyncio.gather(enqueue_word_groups(), *(worker() for _ in range(MAX_CONCURRENT_REQUESTS)))
+    return counts['successful'], counts['failed']
+
 # --- Main Execution ---
 if __name__ == '__main__':
-    # Add schema creation SQL
-    sql_insert_statements.append(generate_schema_sql())
+    # Open the output database once; creates the schema if it does not exist yet
+    conn = open_db_connection(DB_NAME)
     
-    # Clear/Initialize error log
-    with open(ERROR_LOG_FILE, 'w', encoding='utf-8') as f:
-        f.write(f"Error Log - Run started at {time.ctime()}\n" + "="*40 + "\n")
-
-    # Initialize successful JSON log
-    with open(SUCCESSFUL_JSON_LOG_FILE, 'w', encoding='utf-8') as f_json_log:
-        f_json_log.write(f"# Log of successfully processed model JSON responses - Run started at {time.ctime()}\n")
-        f_json_log.write(f"# Each subsequent line is a JSON object: {{'queried_word': ..., 'timestamp': ..., 'response_data': ...}}\n")
-
-    all_words_from_text = read_and_extract_words_from_text_file(TEXT_FILE_PATH)
-
-    if not all_words_from_text:
-        print("No words extracted from text file. Exiting.")
-    else:
-        # Check against DB. For this to work best, DB_NAME should exist and have the 'words' table.
-        # If DB_NAME is new, connect() will create it, but table won't exist, so get_new_words_not_in_db will fallback.
-        words_to_process_query = get_new_words_not_in_db(all_words_from_text, DB_NAME)
-
-        if not words_to_process_query:
-            print("No new words to process. All extracted words might already be in the database (based on 'queried_word' check).")
+    # Clear/Initialize error log; kept open (buffered) for the whole run
+    error_log_file = open(ERROR_LOG_FILE, 'w', buffering=LOG_BUFFER_SIZE, encoding='utf-8')
+    error_log_file.write(f"Error Log - Run started at {time.ctime()}\n" + "="*40 + "\n")
+
+    # Initialize successful JSON log; kept open (buffered, binary: orjson writes UTF-8 bytes) for the whole run
+    f_json_log = open(SUCCESSFUL_JSON_LOG_FILE, 'wb', buffering=LOG_BUFFER_SIZE)
+    f_json_log.write(f"# Log of successfully processed model JSON responses - Run started at {time.ctime()}\n".encode('utf-8'))
+    f_json_log.write(f"# Each subsequent line is a JSON object: {{'queried_word': ..., 'timestamp': ..., 'response_data': ...}}\n".encode('utf-8'))
+
+    try:
+        all_words_from_text = read_and_extract_words_from_text_file(TEXT_FILE_PATH)
+
+        if not all_words_from_text:
+            print("No words extracted from text file. Exiting.")
         else:
-            print(f"\nAttempting translation for {len(words_to_process_query)} new/unchecked words and generating SQL inserts:")
-            try:
-                # Ensure you are authenticated (e.g., via gcloud auth application-default login
-                # in the terminal where this script is run)
-                client = genai.Client(
-                    vertexai=True, 
-                    project="188935312243", # YOUR GCP PROJECT ID
-                    location="europe-southwest1", # YOUR MODEL'S LOCATION
-                )
-                print("GenAI Client initialized successfully.")
-
-                # YOUR SPECIFIC VERTEX AI ENDPOINT
-                model_path_str = "projects/188935312243/locations/europe-southwest1/endpoints/2335389085675290624";
-                # projects/188935312243/locations/europe-southwest1/models/7329546820894326784@1 
-                successful_words = 0
-                failed_words_count = 0
-
-                for i, word_query in enumerate(words_to_process_query):
-                    print(f"\n--- Processing word {i+1}/{len(words_to_process_query)}: '{word_query}' ---")
-                    if process_word_with_retries(client, model_path_str, word_query):
-                        successful_words +=1
-                        print(f"Successfully processed and generated SQL for '{word_query}'.")
-                    else:
-                        failed_words_count +=1
-                        print(f"Failed to process '{word_query}' after retries.")
-                    
-                    # Optional: Short delay to avoid hitting rate limits
-                    if (i + 1) % 10 == 0 and len(words_to_process_query) > 10 : # After every 10 words if there are many
-                       print(f"Pausing for {RETRY_DELAY_SECONDS}s to respect potential rate limits...")
-                       time.sleep(RETRY_DELAY_SECONDS)
-
-
-                print(f"\n--- Summary ---")
-                print(f"Successfully processed and generated SQL for {successful_words} words.")
-                if failed_words_count > 0:
-                    print(f"Failed to process {failed_words_count} words. Check {ERROR_LOG_FILE}.")
-
-            except Exception as e:
-                print(f"\nCRITICAL SCRIPT ERROR (e.g., client init, unexpected issue): {e}")
-                log_error("CRITICAL SCRIPT ERROR", str(e)) # Log the critical error itself
-            
-    # Write all accumulated SQL statements to the file
-    with open(SQL_OUTPUT_FILE, 'w', encoding='utf-8') as f_sql:
-        for stmt in sql_insert_statements:
-            f_sql.write(stmt + "\n")
-    print(f"\nAll SQL statements (schema + inserts) saved to {SQL_OUTPUT_FILE}")
-    if not words_to_process_query and all_words_from_text:
-         print(f"Note: No new words were processed. The SQL file '{SQL_OUTPUT_FILE}' might only contain the schema.")
-    elif not sql_insert_statements[1:]: # Check if only schema is present
-         print(f"Note: No successful word processing. The SQL file '{SQL_OUTPUT_FILE}' might only contain the schema.")
+            # Check against DB. The schema was created above, so a new DB_NAME simply yields every word.
+            words_to_process_query = get_new_words_not_in_db(all_words_from_text, DB_NAME)
+
+            if not words_to_process_query:
+                print("No new words to process. All extracted words might already be in the database (based on 'queried_word' check).")
+            else:
+                print(f"\nAttempting translation for {len(words_to_process_query)} new/unchecked words and saving them to {DB_NAME}:")
+                try:
+                    # Ensure you are authenticated (e.g., via gcloud auth application-default login
+                    # in the terminal where this script is run)
+                    client = genai.Client(
+                        vertexai=True, 
+                        project="188935312243", # YOUR GCP PROJECT ID
+                        location="europe-southwest1", # YOUR MODEL'S LOCATION
+                    )
+                    print("GenAI Client initialized successfully.")
+
+                    # YOUR SPECIFIC VERTEX AI ENDPOINT
+                    model_path_str = "projects/188935312243/locations/europe-southwest1/endpoints/2335389085675290624";
+                    # projects/188935312243/locations/europe-southwest1/models/7329546820894326784@1 
+                    # Model calls run concurrently on one event loop; each word is saved as its response arrives
+                    successful_words, failed_words_count = asyncio.run(fetch_and_save_words(conn, f_json_log, client, model_path_str, words_to_process_query))
+
+                    print(f"\n--- Summary ---")
+                    print(f"Successfully processed and saved {successful_words} words to {DB_NAME}.")
+                    if failed_words_count > 0:
+                        print(f"Failed to process {failed_words_count} words. Check {ERROR_LOG_FILE}.")
+
+                except Exception as e:
+                    print(f"\nCRITICAL SCRIPT ERROR (e.g., client init, unexpected issue): {e}")
+                    log_error("CRITICAL SCRIPT ERROR", str(e)) # Log the critical error itself
+    finally:
+        # Also runs on KeyboardInterrupt, so buffered log entries for words already committed are not lost
+        conn.close()
+        f_json_log.close()
+        error_log_file.close()
+        error_log_file = None
 
+    print(f"\nDatabase: {DB_NAME}")
     print(f"Error log: {ERROR_LOG_FILE}")
     print(f"Successful JSON responses log: {SUCCESSFUL_JSON_LOG_FILE}")
     print("Script finished.")
\ No newline at end of file